@@ -1,14 +1,75 @@
 import streamlit as st
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
-from datetime import datetime
-import json
+import threading
+from collections import deque
+from itertools import islice
+from types import MappingProxyType
+import re
+from urllib.parse import urlsplit, urlunsplit
+import ijson
+import diskcache
+import sqlite3
 
 # Page configuration
 st.set_page_config(page_title="Reddit Book Reviews", layout="wide")
 st.title("📚 Reddit Book Review Finder")
 
+@st.cache_resource
+def get_reddit_session():
+    """Pooled session for Reddit, kept across reruns so fetches share a few keep-alive connections
+    
+    pool_block makes extra workers wait for a free connection instead of
+    opening throwaway sockets to the same host.
+    """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        pool_block=True,
+        max_retries=Retry(total=2, backoff_factor=0.3)
+    ))
+    return session
+
+@st.cache_resource
+def get_serp_session():
+    """Pooled session for SerpAPI, kept across reruns so searches reuse the TLS connection"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_maxsize=4))
+    return session
+
+# Matches Reddit comment-thread permalinks in search results
+_REDDIT_RE = re.compile(r"reddit\.com/r/[^/]+/comments/")
+_THREAD_ID_RE = re.compile(r"/comments/([a-z0-9]+)")
+
+# Reddit asks API clients to identify themselves with a descriptive User-Agent
+REDDIT_USER_AGENT = "python:reddit-book-review-finder:v1.0"
+
+# Headers for the public .json endpoint, which is used without OAuth credentials
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+# On-disk cache location; /tmp is writable on Streamlit Cloud
+CACHE_DIR = "/tmp/reddit_cache"
+
+# Seconds before a cached search or thread is fetched again
+SEARCH_TTL = 3600
+THREAD_TTL = 1800
+
+# Search parameters that are the same for every query
+SEARCH_PARAMS = MappingProxyType({
+    "engine": "google",
+    "hl": "en",
+    "gl": "us"
+})
+
 # Debug mode toggle
 debug_mode = st.sidebar.checkbox("Debug Mode", value=False)
 
@@ -24,6 +85,11 @@ try:
         3. Add:
         [serpapi]
         api_key = "your_actual_serpapi_key"
+        
+        # Optional, for the faster Reddit OAuth API
+        [reddit]
+        client_id = "your_reddit_script_app_id"
+        client_secret = "your_reddit_script_app_secret"
         """)
         st.stop()
 except KeyError:
@@ -33,20 +99,27 @@ except Exception as e:
     st.error(f"❌ Error accessing secrets: {str(e)}")
     st.stop()
 
+# Reddit OAuth credentials are optional; without them the public .json endpoint is used
+try:
+    REDDIT_CLIENT_ID = st.secrets["reddit"]["client_id"]
+    REDDIT_CLIENT_SECRET = st.secrets["reddit"]["client_secret"]
+except KeyError:
+    REDDIT_CLIENT_ID = REDDIT_CLIENT_SECRET = None
+
 # User input
 book_name = st.text_input("Enter Book Title", placeholder="e.g., The Great Gatsby")
 
 def test_api_key():
-    """Test if the API key is working using requests"""
+    """Test if the API key is working using the pooled SerpAPI session"""
     try:
-        url = "https://serpapi.com/search"
         params = {
+            **SEARCH_PARAMS,
             "q": "test search",
             "api_key": SERP_API_KEY,
             "num": 1
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = get_serp_session().get(SERPAPI_URL, params=params, timeout=10)
         response.raise_for_status()
         
         results = response.json()
@@ -71,175 +144,287 @@ if st.button("🔧 Test API Key"):
         else:
             st.error(message)
 
-def get_reddit_urls(query, max_results=10):
-    """Search for Reddit URLs using SerpAPI via requests"""
+@st.cache_resource
+def get_cache():
+    """On-disk cache for search and thread results that survives app restarts"""
+    return diskcache.Cache(CACHE_DIR, size_limit=int(1e8))
+
+def cache_get(key):
+    """Read from the on-disk cache, treating any cache failure as a miss"""
     try:
-        url = "https://serpapi.com/search"
-        params = {
-            "q": f'"{query}" review site:reddit.com',
-            "hl": "en",
-            "gl": "us",
-            "api_key": SERP_API_KEY,
-            "num": max_results
-        }
-        
-        if debug_mode:
-            st.write("🔍 Search parameters:", params)
-        
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
-        
-        results = response.json()
-        
-        if debug_mode:
-            st.write("📊 Raw API Response:", results)
-        
-        if "error" in results:
-            st.error(f"API Error: {results['error']}")
-            return []
-        
-        urls = []
-        organic_results = results.get("organic_results", [])
-        
-        if debug_mode:
-            st.write(f"📈 Found {len(organic_results)} organic results")
-        
-        for result in organic_results:
-            link = result.get("link")
-            title = result.get("title", "")
-            
-            if debug_mode:
-                st.write(f"🔗 Checking link: {link}")
-            
-            # Filter for Reddit comment threads
-            if link and "reddit.com/r/" in link and "/comments/" in link:
-                clean_url = link.split("?")[0].split("#")[0]
-                urls.append({
-                    "url": clean_url,
-                    "title": title
-                })
-                if debug_mode:
-                    st.write(f"✅ Added Reddit URL: {clean_url}")
+        return get_cache().get(key)
+    except (OSError, sqlite3.Error, diskcache.Timeout):
+        return None
+
+def cache_set(key, value, expire):
+    """Write to the on-disk cache; a failed write only costs a refetch later"""
+    try:
+        get_cache().set(key, value, expire=expire)
+    except (OSError, sqlite3.Error, diskcache.Timeout):
+        pass
+
+class FetchError(Exception):
+    """An expected search/fetch failure whose message is shown to the user as-is
+    
+    The fetch functions raise on any failure instead of returning an error, so
+    nothing failed ever reaches the cache; get_reddit_urls and extract_comments
+    turn the exception into the error tuple the UI renders.
+    """
+
+def build_search_params(query, max_results):
+    """SerpAPI parameters for a Reddit review search"""
+    return {
+        **SEARCH_PARAMS,
+        "q": f'"{query}" review site:reddit.com',
+        "api_key": SERP_API_KEY,
+        "num": max_results
+    }
+
+def _search_reddit_urls(query, max_results):
+    """Search SerpAPI for Reddit threads, cached on disk per query"""
+    key = ("search", query, max_results)
+    hit = cache_get(key)
+    if hit is not None:
+        return hit
+    
+    params = build_search_params(query, max_results)
+    response = get_serp_session().get(SERPAPI_URL, params=params, timeout=15)
+    response.raise_for_status()
+    
+    results = response.json()
+    
+    if "error" in results:
+        raise FetchError(f"API Error: {results['error']}")
+    
+    urls = []
+    seen = set()
+    checked_links = []
+    organic_results = results.get("organic_results", [])
+    
+    for result in organic_results:
+        link = result.get("link")
+        title = result.get("title", "")
+        checked_links.append(link)
         
-        return urls
+        # Filter for Reddit comment threads
+        if link and _REDDIT_RE.search(link):
+            parts = urlsplit(link)
+            clean_url = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+            # Skip repeats while keeping SerpAPI's ranking order
+            if clean_url in seen:
+                continue
+            seen.add(clean_url)
+            urls.append({
+                "url": clean_url,
+                "title": title
+            })
     
+    # Kept alongside the URLs so Debug Mode can explain a search, even from cache
+    search_info = {
+        "organic_results": len(organic_results),
+        "kept": len(urls),
+        "checked_links": checked_links
+    }
+    cache_set(key, (urls, search_info), expire=SEARCH_TTL)
+    return urls, search_info
+
+def get_reddit_urls(query, max_results=10):
+    """Search for Reddit URLs; returns (urls, search_info, error_msg, exception)"""
+    try:
+        urls, search_info = _search_reddit_urls(query, max_results)
+        return urls, search_info, None, None
+    except FetchError as e:
+        return [], None, str(e), e
     except requests.exceptions.RequestException as e:
-        st.error(f"Network error: {str(e)}")
-        if debug_mode:
-            st.exception(e)
-        return []
+        return [], None, f"Network error: {str(e)}", e
     except Exception as e:
-        st.error(f"Error searching for Reddit URLs: {str(e)}")
-        if debug_mode:
-            st.exception(e)
-        return []
-
-def extract_comments(url, max_comments=10):
-    """Extract comments from Reddit thread"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+        return [], None, f"Error searching for Reddit URLs: {str(e)}", e
+
+class RateLimiter:
+    """Thread-safe sliding-window limiter: at most max_rate calls per time_period seconds"""
     
-    try:
-        json_url = url + ".json"
-        if debug_mode:
-            st.write(f"📥 Fetching: {json_url}")
-        
-        response = requests.get(json_url, headers=headers, timeout=15)
+    def __init__(self, max_rate, time_period):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block only as long as needed to stay under the rate"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.time_period:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.max_rate:
+                    self._timestamps.append(now)
+                    return
+                wait = self.time_period - (now - self._timestamps[0])
+            time.sleep(wait)
+
+@st.cache_resource
+def get_executor():
+    """Worker pool for network calls, shared across reruns and sessions"""
+    return ThreadPoolExecutor(max_workers=8)
+
+@st.cache_resource
+def get_rate_limiter():
+    """Shared across reruns and sessions so the limit applies to the whole app"""
+    return RateLimiter(max_rate=30, time_period=60)
+
+@st.cache_resource(ttl=3500, show_spinner=False)
+def get_reddit_token():
+    """Fetch an application-only OAuth token for the Reddit API"""
+    response = get_reddit_session().post(
+        "https://www.reddit.com/api/v1/access_token",
+        auth=HTTPBasicAuth(REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET),
+        data={"grant_type": "client_credentials"},
+        headers={"User-Agent": REDDIT_USER_AGENT},
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+def _fetch_thread_comments(url, max_comments, use_oauth):
+    """Fetch and filter a thread's top-level comments, cached on disk per URL"""
+    key = ("thread", url, max_comments)
+    hit = cache_get(key)
+    if hit is not None:
+        return hit
+    
+    # Only ask for top-level comments; over-fetch a little since short
+    # and deleted comments are filtered out below
+    fetch_limit = max_comments * 3
+    query = f"limit={fetch_limit}&depth=1&raw_json=1&sort=top"
+    
+    if use_oauth:
+        match = _THREAD_ID_RE.search(url)
+        if not match:
+            raise FetchError(f"Could not find a thread ID in {url}")
+        json_url = f"https://oauth.reddit.com/comments/{match.group(1)}?{query}"
+        headers = {
+            'Authorization': f"Bearer {get_reddit_token()}",
+            'User-Agent': REDDIT_USER_AGENT
+        }
+    else:
+        json_url = f"{url}.json?{query}"
+        headers = HEADERS
+    
+    get_rate_limiter().acquire()
+    with get_reddit_session().get(json_url, headers=headers, timeout=15, stream=True) as response:
         response.raise_for_status()
+        response.raw.decode_content = True
+        thread_info = {"status": response.status_code, "children": 0}
         
-        data = response.json()
-        
-        if debug_mode:
-            st.write(f"📊 Response status: {response.status_code}")
-            st.write(f"📊 Data structure: {type(data)}, length: {len(data) if isinstance(data, list) else 'N/A'}")
+        # Stream the listing children instead of loading the whole payload;
+        # the first listing holds the post itself (t3), comments are t1
+        def listing_children():
+            for child in ijson.items(response.raw, "item.data.children.item", use_float=True):
+                thread_info["children"] += 1
+                yield child
         
-        # Check if we have the expected structure
-        if not isinstance(data, list) or len(data) < 2:
-            return ["Invalid response format - not a list or too short"]
-        
-        if "data" not in data[1] or "children" not in data[1]["data"]:
-            return ["Invalid thread structure - missing data or children"]
-        
-        comments_data = data[1]["data"]["children"]
+        comment_children = (c for c in listing_children() if c.get("kind") == "t1")
         comments = []
         
-        if debug_mode:
-            st.write(f"📈 Found {len(comments_data)} raw comments")
-        
-        for comment in comments_data:
-            if "data" not in comment:
+        for comment in islice(comment_children, fetch_limit):
+            comment_data = comment.get("data")
+            if not comment_data:
                 continue
-                
-            comment_data = comment["data"]
+            
             body = comment_data.get("body", "")
-            author = comment_data.get("author", "Unknown")
-            score = comment_data.get("score", 0)
             
             # Filter out deleted/removed comments and very short ones
-            if body and body not in ["[deleted]", "[removed]"] and len(body) > 30:
-                comments.append({
-                    "author": author,
-                    "body": body[:800] + "..." if len(body) > 800 else body,
-                    "score": score
-                })
-                
+            if not body or body in ("[deleted]", "[removed]") or len(body) <= 30:
+                continue
+            
+            comments.append({
+                "author": comment_data.get("author", "Unknown"),
+                "body": body[:800] + "..." if len(body) > 800 else body,
+                "score": comment_data.get("score", 0)
+            })
+            
             if len(comments) >= max_comments:
                 break
         
-        if debug_mode:
-            st.write(f"✅ Extracted {len(comments)} valid comments")
-        
-        return comments
+        # Read what's left of the (small, limit/depth-bounded) body so the
+        # connection goes back to the pool instead of being closed
+        response.raw.read()
     
+    # Every real thread has at least the post itself under the listings
+    if not thread_info["children"]:
+        raise FetchError("Invalid thread structure - missing data or children")
+    
+    cache_set(key, (comments, thread_info), expire=THREAD_TTL)
+    return comments, thread_info
+
+def extract_comments(url, max_comments=10, use_oauth=False):
+    """Extract comments from Reddit thread; returns (comments, thread_info, error_msg, exception)"""
+    try:
+        comments, thread_info = _fetch_thread_comments(url, max_comments, use_oauth)
+        return comments, thread_info, None, None
+    except FetchError as e:
+        return [], None, str(e), e
     except requests.exceptions.RequestException as e:
-        error_msg = f"Network error accessing {url}: {str(e)}"
-        if debug_mode:
-            st.exception(e)
-        return [error_msg]
-    except json.JSONDecodeError as e:
-        error_msg = f"JSON parsing error: {str(e)}"
-        if debug_mode:
-            st.exception(e)
-        return [error_msg]
+        return [], None, f"Network error accessing {url}: {str(e)}", e
+    except ijson.JSONError as e:
+        return [], None, f"JSON parsing error: {str(e)}", e
     except Exception as e:
-        error_msg = f"Unexpected error: {str(e)}"
-        if debug_mode:
-            st.exception(e)
-        return [error_msg]
+        return [], None, f"Unexpected error: {str(e)}", e
+
+def show_thread_debug(url_data, comments, thread_info, exc):
+    """Write a thread's fetch diagnostics when Debug Mode is on"""
+    st.write(f"📥 Fetched: {url_data['url']}")
+    if thread_info:
+        st.write(f"📊 Response status: {thread_info['status']}, {thread_info['children']} listing children")
+    st.write(f"✅ Extracted {len(comments)} valid comments")
+    if exc:
+        st.exception(exc)
 
-def display_comments(comments, thread_title, url):
+def display_comments(comments, thread_title, url, error_msg=None):
     """Display comments in a formatted way"""
     st.subheader(f"📝 {thread_title}")
     st.write(f"**Source:** [Reddit Thread]({url})")
     
-    if not comments:
-        st.write("No comments found for this thread.")
+    if error_msg:
+        st.error(error_msg)
         return
     
-    # Check if comments are error messages
-    if len(comments) == 1 and isinstance(comments[0], str) and "error" in comments[0].lower():
-        st.error(comments[0])
-        return
-    
-    valid_comments = [c for c in comments if isinstance(c, dict)]
-    
-    if not valid_comments:
-        st.warning("No valid comments found in this thread.")
+    if not comments:
+        st.write("No comments found for this thread.")
         return
     
-    for i, comment in enumerate(valid_comments, 1):
+    for i, comment in enumerate(comments, 1):
         with st.expander(f"💬 Comment {i} by u/{comment['author']} (Score: {comment['score']})"):
             st.write(comment['body'])
     
     st.divider()
 
-# Main application logic
-if book_name:
+@st.fragment
+def render_reviews(book_name):
+    """Search, fetch and render the reviews for one book
+    
+    Runs as a fragment, so widgets inside it (like the view toggle and row
+    selection) rerun only this block instead of the whole script.
+    """
     st.write(f"🔍 Searching for Reddit reviews on: **{book_name}**...")
     
+    # The OAuth token doesn't depend on the search, so fetch it alongside
+    token_future = get_executor().submit(get_reddit_token) if REDDIT_CLIENT_ID else None
+    
     with st.spinner("Fetching Reddit threads..."):
-        reddit_urls = get_reddit_urls(book_name, max_results=5)
+        reddit_urls, search_info, search_error, search_exc = get_reddit_urls(book_name, max_results=5)
+    
+    if search_error:
+        st.error(search_error)
+    
+    if debug_mode:
+        st.write("🔍 Search parameters:", {**build_search_params(book_name, 5), "api_key": "***"})
+        if search_info:
+            st.write(f"📈 Found {search_info['organic_results']} organic results, kept {search_info['kept']} Reddit threads")
+            st.write("🔗 Checked links:", search_info['checked_links'])
+        if search_exc:
+            st.exception(search_exc)
+        st.write("🔗 Reddit URLs:", reddit_urls)
     
     if not reddit_urls:
         st.warning("⚠️ No Reddit threads found for this book.")
@@ -251,15 +436,93 @@ if book_name:
     else:
         st.success(f"🎉 Found {len(reddit_urls)} Reddit threads!")
         
-        # Display all threads
-        for i, url_data in enumerate(reddit_urls, 1):
-            st.markdown(f"## Thread {i}")
-            
-            with st.spinner(f"Loading comments from thread {i}..."):
-                comments = extract_comments(url_data['url'])
-                time.sleep(1)  # Rate limiting
+        # A single grid is one payload to the browser; per-thread expanders are opt-in
+        show_threads = st.toggle("Show comments grouped by thread", value=False)
+        
+        # Resolve the token once here, so a bad secret is one message instead
+        # of every thread fetch retrying the token request on its own
+        use_oauth = False
+        if token_future:
+            try:
+                token_future.result()
+                use_oauth = True
+            except Exception as e:
+                st.warning(f"⚠️ Reddit OAuth failed, using the public endpoint instead: {str(e)}")
+                if debug_mode:
+                    st.exception(e)
+        
+        # Reserve a slot per thread up front so results keep search order
+        # while each one renders as soon as its fetch finishes
+        placeholders = [st.empty() for _ in reddit_urls] if show_threads else None
+        results = [None] * len(reddit_urls)
+        
+        with st.spinner(f"Loading comments from {len(reddit_urls)} threads..."):
+            ex = get_executor()
+            futures = {
+                ex.submit(extract_comments, url_data['url'], use_oauth=use_oauth): i
+                for i, url_data in enumerate(reddit_urls)
+            }
+            for fut in as_completed(futures):
+                i = futures[fut]
+                url_data = reddit_urls[i]
+                comments, thread_info, error_msg, exc = fut.result()
+                results[i] = (url_data, comments, thread_info, error_msg, exc)
+                
+                if show_threads:
+                    with placeholders[i].container():
+                        st.markdown(f"## Thread {i + 1}")
+                        if debug_mode:
+                            show_thread_debug(url_data, comments, thread_info, exc)
+                        display_comments(comments, url_data['title'], url_data['url'], error_msg)
+        
+        if show_threads:
+            return
+        
+        # Build the frame column by column rather than as a list of row dicts
+        thread_col, url_col, author_col, score_col, body_col = [], [], [], [], []
+        for url_data, comments, thread_info, error_msg, exc in results:
+            if error_msg:
+                st.error(f"{url_data['title']}: {error_msg}")
+            if debug_mode:
+                show_thread_debug(url_data, comments, thread_info, exc)
             
-            display_comments(comments, url_data['title'], url_data['url'])
+            thread_col.extend([url_data['title']] * len(comments))
+            url_col.extend([url_data['url']] * len(comments))
+            author_col.extend(c['author'] for c in comments)
+            score_col.extend(c['score'] for c in comments)
+            body_col.extend(c['body'] for c in comments)
+        
+        if not body_col:
+            st.warning("No valid comments found in these threads.")
+            return
+        
+        # Imported here so reruns without a search don't pay for loading pandas
+        import pandas as pd
+        df = pd.DataFrame({
+            "Thread": thread_col,
+            "Reddit URL": url_col,
+            "Author": author_col,
+            "Score": score_col,
+            "Body": body_col
+        }, copy=False)
+        
+        event = st.dataframe(
+            df.assign(Body=df["Body"].str.slice(0, 500)),
+            column_config={"Reddit URL": st.column_config.LinkColumn("Reddit URL")},
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row"
+        )
+        
+        # The grid shows a preview; the selected row's full comment goes below it
+        for row in event.selection.rows:
+            st.markdown(f"**u/{df.at[row, 'Author']}** (Score: {df.at[row, 'Score']})")
+            st.write(df.at[row, "Body"])
+
+# Main application logic
+if book_name:
+    render_reviews(book_name)
 
 # Sidebar with information
 with st.sidebar: